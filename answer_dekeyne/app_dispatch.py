@@ -1,9 +1,14 @@
 
-import json
 import logging as log
 
 from flask import Flask, request
 from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from dispatch_algorithm import PowerDispatcher
 from json_checker import JsonChecker
@@ -14,34 +19,40 @@ log.StreamHandler()
 
 logger = log.getLogger()
 
-app = Flask(__name__)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Parses the requests and serializes the responses with orjson
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
 
-@app.errorhandler(KeyError)
-def server_error(err):
-    app.logger.exception(err)
-    return "Key error: " + str(err) + ', 500\n'
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 
-@app.errorhandler(TypeError)
-def server_error(err):
-    app.logger.exception(err)
-    return "Type error: " + str(err) + ', 500\n'
+app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
 
-@app.errorhandler(ValueError)
 def server_error(err):
     app.logger.exception(err)
-    return "Value error: " + str(err) + ', 500\n'
+    return '{}: {}, 500\n'.format(type(err).__name__, err), 500
+
+
+for exception in (KeyError, TypeError, ValueError):
+    app.register_error_handler(exception, server_error)
 
 
 @app.route('/productionplan', endpoint='productionplan', methods=['POST'])
 def app_dispatch():
     logger.info('Loading input json payload')
-    data = json.loads(request.get_data())
+    # Parsing regardless of the Content-Type, as curl posts the payload as form data
+    data = request.get_json(force=True, cache=False)
 
     if 'payload' not in data.keys():
-        return KeyError('payload not specified')
+        raise KeyError('payload not specified')
 
     payload = data['payload']
 
@@ -54,13 +65,7 @@ def app_dispatch():
             raise ValueError('cannot convert carbon value {} to float'.format(data['carbon']))
 
     logger.info('Testing the input json data')
-    json_tester = JsonChecker(payload)
-    logger.info('Testing the specified load')
-    json_tester.test_load()
-    logger.info('Testing the fuels content')
-    json_tester.test_fuels()
-    logger.info('Testing the power plants description')
-    json_tester.test_powerplants()
+    JsonChecker(payload).test_payload()
     logger.info('Testing complete, the input json is valid')
 
     logger.info('Creating power dispatcher')
@@ -1,7 +1,7 @@
 
 import logging as log
-import pandas as pd
-from copy import deepcopy
+import math
+from operator import itemgetter
 
 logger = log.getLogger(__name__)
 
@@ -14,48 +14,56 @@ class PowerDispatcher:
         self.plants = payload['powerplants']
         self.fuels = payload['fuels']
         self.required_load = payload['load']
+        self.carbon_rate = carbon_rate
+        self.gas_price = float(self.fuels['gas(euro/MWh)'])
+        self.kerosine_price = float(self.fuels['kerosine(euro/MWh)'])
+        self.wind_factor = float(self.fuels['wind(%)']) / 100
+        # Emission allowance cost for each MWh generated by a gas-fired plant, the carbon rate being in ton/MWh
         if carbon_rate is None:
-            self.carbon_price = None
+            self.carbon_price = 0.0
         else:
             self.carbon_price = carbon_rate * self.fuels['co2(euro/ton)']
-        self.dispatch_build = pd.DataFrame(columns=('name', 'p', 'pmin'))
+        self.dispatch_build = []
         self.current_load = 0
-        self.get_merit_plants = {'gasfired': (self.get_merit_gasfired, ('efficiency',)),
-                                 'turbojet': (self.get_merit_turbojet, ('efficiency',)),
-                                 'windturbine': (self.get_merit_windturbine, ())}
     
     def define_merit_orders(self):
         """
-        Defines the merit order of each power plant
-        :return: pandas data frame detailing the power plants
+        Computes the merit order of each power plant
+        :return: list of dictionaries describing the power plants, ordered by merit
         """
-        merit_plant = deepcopy(self.plants)
+        # Plants only hold scalar values, a shallow copy is enough to keep the payload untouched
+        merit_plant = [plant.copy() for plant in self.plants]
+        # The plants come as dictionaries: moving their values to and from numpy arrays costs more than
+        # this loop and list.sort, so neither a vectorized merit computation nor argsort pays off at any size
         for plant in merit_plant:
-            if plant['type'] not in self.get_merit_plants:
-                raise ValueError('Unknown power plant type {}'.format(plant['type']))
-
             plant['merit_order'] = self.get_merit_plant(plant)
+            # Baking the maximal power in so that the dispatch does not depend on the plant type anymore
+            plant['pmax_effective'] = self.find_max_power(plant)
 
-        # Converting the dictionary in a Pandas data frame ordered by merit
-        return pd.DataFrame.from_dict(merit_plant).sort_values('merit_order')
+        merit_plant.sort(key=itemgetter('merit_order'))
+        return merit_plant
 
     def get_merit_plant(self, plant):
         """
-        Computes the merit order for one specific plant with its own method
+        Computes the merit order for one specific plant with respect to its type
         :param plant: dictionary describing the plant
         :return: the merit order value
         """
-        merit_order_method = self.get_merit_plants[plant['type']][0]
-        args_keys = self.get_merit_plants[plant['type']][1]
-        args = [plant[key] for key in args_keys]
+        plant_type = plant['type']
+        if plant_type == 'windturbine':
+            return 0.0
 
-        try:
-            merit_order = merit_order_method(*args)
+        if plant_type != 'gasfired' and plant_type != 'turbojet':
+            raise ValueError('Unknown power plant type {}'.format(plant_type))
 
-        except ZeroDivisionError:
+        efficiency = plant['efficiency']
+        if efficiency == 0:
             raise ValueError('Failed to compute merit order for plant {}, efficiency is null'.format(plant['name']))
 
-        return merit_order
+        if plant_type == 'gasfired':
+            return self.get_merit_gasfired(efficiency)
+
+        return self.get_merit_turbojet(efficiency)
 
     def get_merit_gasfired(self, efficiency):
         """
@@ -63,44 +71,33 @@ class PowerDispatcher:
         :param efficiency: energetic efficiency of the powerplant
         :return: the merit order value
         """
-        if self.carbon_price is None:
-            return self.fuels['gas(euro/MWh)'] / efficiency
-        return self.fuels['gas(euro/MWh)'] / efficiency * self.carbon_price
+        return self.gas_price / efficiency + self.carbon_price
 
     def get_merit_turbojet(self, efficiency):
         """
-        Computes the merit order of a turbojet plant given its efficiency and the eventual carbon price
+        Computes the merit order of a turbojet plant given its efficiency
+        Only the gas-fired plants are charged for their CO2 emissions
         :param efficiency: energetic efficiency of the powerplant
         :return: the merit order value
         """
-        if self.carbon_price is None:
-            return self.fuels['kerosine(euro/MWh)'] / efficiency
-        return self.fuels['kerosine(euro/MWh)'] / efficiency * self.carbon_price
-
-    @staticmethod
-    def get_merit_windturbine():
-        """
-        Computes the merit order of a wind turbine power plant
-        :return: the merit order value
-        """
-        return 0
+        return self.kerosine_price / efficiency
 
     def dispatch_load(self, power_plants):
         """
         Core method of the power dispatch algorithm
-        :param power_plants: pandas DataFrame describing the plants
+        :param power_plants: iterable of dictionaries describing the plants, as returned by define_merit_orders
         :return: the formatted json containing the power dispatch
         """
-        for _, plant in power_plants.iterrows():
+        for plant in power_plants:
             # Computing how much power left is needed
-            self.current_load = self.dispatch_build['p'].sum()
             remaining_load = round(self.required_load - self.current_load, 1)
             # Compute how much power can the current plant handle
             power, overload = self.find_load_for_plant(remaining_load, plant)
-            # If the load stays above the plant's pmin, add a new row
+            # If the load stays above the plant's pmin, add a new entry
             if overload == 0:
                 plant_dict = {'name': plant['name'], 'p': power, 'pmin': plant['pmin']}
-                self.dispatch_build = self.dispatch_build.append(plant_dict, ignore_index=True)
+                self.dispatch_build.append(plant_dict)
+                self.current_load += power
                 logger.info('%sMWh attributed to power plant %s', power, plant['name'])
 
             else:
@@ -109,7 +106,6 @@ class PowerDispatcher:
 
             logger.info('Total is now %sMWh', self.current_load)
 
-        self.current_load = self.dispatch_build['p'].sum()
         return self.sort_results()
 
     def find_load_for_plant(self, remaining_load, plant):
@@ -118,20 +114,20 @@ class PowerDispatcher:
         If the needed load is above the plant's minimum output, the difference between both
         will be considered as an overload to remove from the previous plants
         :param remaining_load: how much power is left to dispatch
-        :param plant: dictionary describing the plant
+        :param plant: dictionary describing the plant, including its effective maximal power
         :return: the amount of power attributed to the plant and the eventual overload
         """
         if remaining_load == 0:
             return 0, 0
 
-        maximal_power = self.find_max_power(plant)
+        maximal_power = plant['pmax_effective']
         minimal_power = plant['pmin']
 
         if remaining_load >= maximal_power:
             return maximal_power, 0
 
         if remaining_load < minimal_power:
-            return minimal_power, round(minimal_power - remaining_load, 1)
+            return minimal_power, minimal_power - remaining_load
 
         return remaining_load, 0
 
@@ -142,8 +138,9 @@ class PowerDispatcher:
         :return: the maximal value in MWh
         """
         if plant['type'] == 'windturbine':
-            # Compute the maximal power given the wind conditions
-            return plant['pmax'] * self.fuels['wind(%)'] / 100
+            # Compute the maximal power given the wind conditions, rounded down to a multiple of 0.1MWh
+            # so that the park is never given more than it can produce, float noise aside
+            return math.floor(plant['pmax'] * self.wind_factor * 10 + 1e-9) / 10
 
         return plant['pmax']
 
@@ -154,24 +151,32 @@ class PowerDispatcher:
         :param plant: dictionary describing the plant
         :param overload: the amount of power to remove from the previous plants
         """
-        new_dispatch_build = pd.DataFrame(columns=('name', 'p', 'pmin'))
-        # Sifting through the dispatch backwards to remove power from plants of lower merit
-        for _, previous_plant in self.dispatch_build[::-1].iterrows():
-            plant_dict, overload = self.compute_power_reduction(previous_plant, overload)
-            new_dispatch_build = new_dispatch_build.append(plant_dict, ignore_index=True)
-
-        if overload == 0:
-            self.dispatch_build = new_dispatch_build[::-1]
+        # Keeping the current dispatch aside in case the power cannot be redistributed
+        previous_dispatch_build = list(self.dispatch_build)
+        # Sifting through the dispatch backwards to remove power from plants of lower merit, stopping as soon as
+        # the overload is absorbed. Previous plants may have to be switched off rather than just brought down to
+        # their pmin, which is why the margins above pmin alone cannot tell in advance whether this succeeds
+        remaining_overload = overload
+        for i in range(len(self.dispatch_build) - 1, -1, -1):
+            self.dispatch_build[i], remaining_overload = self.compute_power_reduction(self.dispatch_build[i],
+                                                                                     remaining_overload)
+            if remaining_overload == 0:
+                break
+
+        if remaining_overload == 0:
             plant_dict = {'name': plant['name'], 'p': plant['pmin'], 'pmin': plant['pmin']}
-            self.dispatch_build = self.dispatch_build.append(plant_dict, ignore_index=True)
+            self.dispatch_build.append(plant_dict)
+            # The overload removed from the previous plants is part of the new plant's pmin
+            self.current_load += plant['pmin'] - overload
             logger.info('Load corrected:')
-            for _, previous_plant in self.dispatch_build.iterrows():
+            for previous_plant in self.dispatch_build:
                 logger.info('Correction: %sMWh attributed to power plant %s',
                             previous_plant['p'], previous_plant['name'])
 
         else:
+            self.dispatch_build = previous_dispatch_build
             plant_dict = {'name': plant['name'], 'p': 0, 'pmin': plant['pmin']}
-            self.dispatch_build = self.dispatch_build.append(plant_dict, ignore_index=True)
+            self.dispatch_build.append(plant_dict)
             logger.info('Failed to include power plant %s, 0 attributed', plant['name'])
 
     @staticmethod
@@ -181,6 +186,7 @@ class PowerDispatcher:
         :param previous_plant: dictionary describing a plant of lower order
         :param overload: the amount of power to remove from the previous plants
         """
+        # Rounding the reduced power keeps it a multiple of 0.1MWh, and lets an overload be exactly absorbed
         remaining_power = round(previous_plant['p'] - overload, 1)
         # If the overload is above the power assigned to the plant
         if remaining_power <= 0:
@@ -202,8 +208,11 @@ class PowerDispatcher:
         """
         Removes the minimal power from the dispatch results and formats the result list
         """
-        if self.current_load != self.required_load:
+        # The running total adds up multiples of 0.1MWh, only its float noise needs rounding off
+        current_load = round(self.current_load, 1)
+        if current_load != self.required_load:
             raise ValueError('Failed to reached the required power load: {}MWh instead of {}MWh required'
-                             .format(self.current_load, self.required_load))
+                             .format(current_load, self.required_load))
+
+        return [{'name': plant['name'], 'p': plant['p']} for plant in self.dispatch_build]
 
-        return [{'name': plant['name'], 'p': plant['p']} for _, plant in self.dispatch_build.iterrows()]
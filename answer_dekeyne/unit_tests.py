@@ -1,30 +1,54 @@
 import json
+import os
 import unittest
 import pytest
-import pandas as pd
 
+from app_dispatch import ORJSONProvider, app, orjson
 from dispatch_algorithm import PowerDispatcher
 from json_checker import JsonChecker
 
 
+def load_example_payload(name):
+    with open(os.path.join(os.path.dirname(__file__), '..', 'example_payloads', name)) as payload_file:
+        return json.load(payload_file)
+
+
 class TestChecker(unittest.TestCase):
-    def test_correct_key_value(self):
-        assert JsonChecker.key_value_test('key', {'key': 1}, '', int) is None
+    def setUp(self):
+        self.payload = load_example_payload('payload1.json')
 
-    def test_missing_key(self):
-        with pytest.raises(KeyError) as msg:
-            JsonChecker.key_value_test('key', {None: None}, '', None)
-        assert msg.value
+    def test_correct_payload(self):
+        assert JsonChecker(self.payload).test_payload() is None
 
-    def test_wrong_type(self):
-        with pytest.raises(TypeError) as msg:
-            JsonChecker.key_value_test('key', {'key': 1}, '', str)
-        assert msg.value
+    def test_missing_load(self):
+        del self.payload['load']
+        with pytest.raises(ValueError) as msg:
+            JsonChecker(self.payload).test_payload()
+        assert 'load' in str(msg.value)
+
+    def test_fuels_missing_key(self):
+        del self.payload['fuels']['kerosine(euro/MWh)']
+        with pytest.raises(ValueError) as msg:
+            JsonChecker(self.payload).test_payload()
+        assert 'kerosine(euro/MWh)' in str(msg.value)
+
+    def test_powerplants_not_dictionary(self):
+        self.payload['powerplants'][0] = 'gasfiredbig1'
+        with pytest.raises(ValueError) as msg:
+            JsonChecker(self.payload).test_payload()
+        assert 'powerplants[0]' in str(msg.value)
+
+    def test_powerplants_wrong_type(self):
+        self.payload['powerplants'][0]['pmin'] = '100'
+        with pytest.raises(ValueError) as msg:
+            JsonChecker(self.payload).test_payload()
+        assert 'powerplants[0].pmin' in str(msg.value)
 
 
 class TestPowerDispatcher(unittest.TestCase):
     def setUp(self):
-        self.payload = {"load": 480, "fuels": {"gas(euro/MWh)": 13.4, "co2(euro/ton)": 20}, "powerplants":
+        self.payload = {"load": 480, "fuels": {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "co2(euro/ton)": 20,
+                                               "wind(%)": 60}, "powerplants":
                         [{"name": "gasfiredbig1", "type": "gasfired", "efficiency": 0.53, "pmin": 100, "pmax": 460}]}
         self.power_dispatcher = PowerDispatcher(self.payload, 0.3)
 
@@ -32,6 +56,12 @@ class TestPowerDispatcher(unittest.TestCase):
         power_dispatcher = PowerDispatcher(self.payload, 0.3)
         assert len(power_dispatcher.define_merit_orders()) == 1
 
+    def test_define_merit_orders_max_power(self):
+        self.payload['powerplants'].append({"name": "windpark1", "type": "windturbine", "efficiency": 1, "pmin": 0,
+                                            "pmax": 150})
+        merit_orders = PowerDispatcher(self.payload, 0.3).define_merit_orders()
+        assert [plant['pmax_effective'] for plant in merit_orders] == [90, 460]
+
     def test_fail_merit_order(self):
         self.payload["powerplants"][0]["type"] = 'mock'
         power_dispatcher = PowerDispatcher(self.payload, 0.3)
@@ -44,6 +74,10 @@ class TestPowerDispatcher(unittest.TestCase):
         power_dispatcher = PowerDispatcher(self.payload, 0.3)
         assert isinstance(power_dispatcher.get_merit_plant(self.payload['powerplants'][0]), float)
 
+    def test_get_merit_plant_wind(self):
+        plant = {"name": "windpark1", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 150}
+        assert self.power_dispatcher.get_merit_plant(plant) == 0
+
     def test_fail_merit_plant_zero(self):
         self.payload["powerplants"][0]["efficiency"] = 0
         power_dispatcher = PowerDispatcher(self.payload, 0.3)
@@ -55,38 +89,88 @@ class TestPowerDispatcher(unittest.TestCase):
         power_dispatcher = PowerDispatcher(self.payload, 0.3)
         assert isinstance(power_dispatcher.get_merit_gasfired(self.payload['powerplants'][0]['efficiency']), float)
 
+    def test_get_merit_gasfired_carbon(self):
+        # 13.4 euro/MWh of gas at 53% efficiency, plus 0.3 ton/MWh of CO2 at 20 euro/ton
+        merit_order = self.power_dispatcher.get_merit_gasfired(self.payload['powerplants'][0]['efficiency'])
+        assert merit_order == pytest.approx(13.4 / 0.53 + 0.3 * 20)
+
+    def test_define_merit_orders_carbon(self):
+        self.payload['fuels']['co2(euro/ton)'] = 500
+        self.payload['powerplants'].append({"name": "tj1", "type": "turbojet", "efficiency": 0.3, "pmin": 0,
+                                            "pmax": 16})
+        # 25.3 euro/MWh for gas against 169.3 euro/MWh for kerosine, plus 150 euro/MWh of CO2 for gas only
+        assert [plant['name'] for plant in PowerDispatcher(self.payload, None).define_merit_orders()] == \
+            ['gasfiredbig1', 'tj1']
+        assert [plant['name'] for plant in PowerDispatcher(self.payload, 0.3).define_merit_orders()] == \
+            ['tj1', 'gasfiredbig1']
+
     def test_get_merit_turbojet(self):
         power_dispatcher = PowerDispatcher(self.payload, None)
-        self.payload["fuels"]["kerosine(euro/MWh)"] = 50.8
         assert isinstance(power_dispatcher.get_merit_turbojet(self.payload['powerplants'][0]['efficiency']), float)
 
     def test_dispatch_load_default(self):
         pmax = self.power_dispatcher.required_load
-        power_plants = pd.DataFrame(
-            {"name": ["gasfiredbig1"], "type": ["gasfired"], "efficiency": [0.53], "pmin": [100], "pmax": [pmax]})
+        power_plants = [{"name": "gasfiredbig1", "type": "gasfired", "efficiency": 0.53, "pmin": 100, "pmax": pmax,
+                         "pmax_effective": pmax}]
         self.power_dispatcher.dispatch_load(power_plants)
 
     def test_dispatch_load_overload(self):
-        power_plants = pd.DataFrame({"name": ["gasfiredbig1", "gasfiredbig2"], "type": ["gasfired", "gasfired"],
-                                     "efficiency": [0.53, 0.53], "pmin": [100, 100], "pmax": [460, 460]})
-        assert self.power_dispatcher.dispatch_load(power_plants)
+        power_plants = [{"name": "gasfiredbig1", "type": "gasfired", "efficiency": 0.53, "pmin": 100, "pmax": 460,
+                         "pmax_effective": 460},
+                        {"name": "gasfiredbig2", "type": "gasfired", "efficiency": 0.53, "pmin": 100, "pmax": 460,
+                         "pmax_effective": 460}]
+        assert self.power_dispatcher.dispatch_load(power_plants) == [{'name': 'gasfiredbig1', 'p': 380},
+                                                                     {'name': 'gasfiredbig2', 'p': 100}]
+
+    def test_dispatch_load_switch_off(self):
+        # The last gas-fired plant can only start if the cheaper one, already at its pmin, is switched off
+        self.payload['load'] = 161
+        self.payload['fuels']['wind(%)'] = 100
+        self.payload['powerplants'] = [
+            {"name": "windpark1", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 20},
+            {"name": "gasfired1", "type": "gasfired", "efficiency": 1, "pmin": 20, "pmax": 30},
+            {"name": "gasfired2", "type": "gasfired", "efficiency": 0.37, "pmin": 150, "pmax": 170},
+            {"name": "gasfired3", "type": "gasfired", "efficiency": 0.37, "pmin": 20, "pmax": 70},
+            {"name": "tj1", "type": "turbojet", "efficiency": 0.3, "pmin": 0, "pmax": 10}]
+        power_dispatcher = PowerDispatcher(self.payload, None)
+        results = power_dispatcher.dispatch_load(power_dispatcher.define_merit_orders())
+        assert results == [{'name': 'windpark1', 'p': 11}, {'name': 'gasfired1', 'p': 0},
+                           {'name': 'gasfired2', 'p': 150}, {'name': 'gasfired3', 'p': 0}, {'name': 'tj1', 'p': 0}]
+
+    def dispatch_fractional_wind(self, wind_pmax):
+        self.payload['load'] = 1
+        self.payload['fuels']['wind(%)'] = 25
+        self.payload['powerplants'] = [
+            {"name": "windpark1", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": wind_pmax},
+            {"name": "windpark2", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 1},
+            {"name": "gasfiredbig1", "type": "gasfired", "efficiency": 0.53, "pmin": 0, "pmax": 100}]
+        power_dispatcher = PowerDispatcher(self.payload, None)
+        return [plant['p'] for plant in power_dispatcher.dispatch_load(power_dispatcher.define_merit_orders())]
+
+    def test_dispatch_load_fractional_wind(self):
+        # 25% of 1MW and 3MW of wind are 0.25MW and 0.75MW, rounded down to multiples of 0.1MW
+        for wind_pmax, expected in ((1, [0.2, 0.2, 0.6]), (3, [0.7, 0.2, 0.1])):
+            powers = self.dispatch_fractional_wind(wind_pmax)
+            assert powers == pytest.approx(expected)
+            assert all(round(p * 10) == pytest.approx(p * 10) for p in powers)
+            assert round(sum(powers), 1) == self.payload['load']
 
     def test_find_load_for_plant_zero(self):
         assert self.power_dispatcher.find_load_for_plant(0, None) == (0, 0)
 
     def test_find_load_for_plant_max(self):
         pmax = 100
-        plant = {'type': 'gasfired', 'pmin': 0, 'pmax': pmax}
+        plant = {'type': 'gasfired', 'pmin': 0, 'pmax': pmax, 'pmax_effective': pmax}
         assert self.power_dispatcher.find_load_for_plant(pmax, plant) == (pmax, 0)
 
     def test_find_load_for_plant_min(self):
         pmin = 100
-        plant = {'type': 'gasfired', 'pmin': pmin, 'pmax': pmin*2}
+        plant = {'type': 'gasfired', 'pmin': pmin, 'pmax': pmin*2, 'pmax_effective': pmin*2}
         assert self.power_dispatcher.find_load_for_plant(pmin/2, plant) == (pmin, pmin/2)
 
     def test_find_load_for_plant_default(self):
         p = 100
-        plant = {'type': 'gasfired', 'pmin': p/2, 'pmax': p*2}
+        plant = {'type': 'gasfired', 'pmin': p/2, 'pmax': p*2, 'pmax_effective': p*2}
         assert self.power_dispatcher.find_load_for_plant(p, plant) == (p, 0)
 
     def test_define_max_power(self):
@@ -99,15 +183,52 @@ class TestPowerDispatcher(unittest.TestCase):
         plant = {'type': 'windturbine', 'pmin': 0, 'pmax': 200}
         assert power_dispatcher.find_max_power(plant) == 100
 
+    def test_define_max_power_wind_fraction(self):
+        plant = {'type': 'windturbine', 'pmin': 0, 'pmax': 118.5}
+        self.payload['fuels']['wind(%)'] = 10
+        # 11.85MW of wind is available, 11.9MW would be more than the park can produce
+        assert PowerDispatcher(self.payload, None).find_max_power(plant) == 11.8
+        plant['pmax'] = 36
+        self.payload['fuels']['wind(%)'] = 60
+        # 36 * 0.6 is 21.599999999999998 in floating point
+        assert PowerDispatcher(self.payload, None).find_max_power(plant) == 21.6
+
     def test_handle_overload_success(self):
         plant = {'name': 'gasfiredbig1', 'p': 100, 'pmin': 100}
         self.power_dispatcher.handle_overload(plant, 5)
-        assert self.power_dispatcher.dispatch_build['p'][0] == 0
+        assert self.power_dispatcher.dispatch_build[0]['p'] == 0
 
     def test_handle_overload_failure(self):
         plant = {'name': 'gasfiredbig1', 'p': 100, 'pmin': 100}
         self.power_dispatcher.handle_overload(plant, 0)
-        assert self.power_dispatcher.dispatch_build['p'][0] == 100
+        assert self.power_dispatcher.dispatch_build[0]['p'] == 100
+
+    def set_previous_dispatch(self):
+        self.power_dispatcher.dispatch_build = [{'name': 'plant1', 'p': 200, 'pmin': 0},
+                                                {'name': 'plant2', 'p': 300, 'pmin': 200}]
+
+    def test_handle_overload_several_plants(self):
+        self.set_previous_dispatch()
+        self.power_dispatcher.handle_overload({'name': 'plant3', 'pmin': 150}, 150)
+        assert [plant['p'] for plant in self.power_dispatcher.dispatch_build] == [150, 200, 150]
+
+    def test_handle_overload_switch_off(self):
+        self.set_previous_dispatch()
+        self.power_dispatcher.handle_overload({'name': 'plant3', 'pmin': 400}, 400)
+        assert [plant['p'] for plant in self.power_dispatcher.dispatch_build] == [100, 0, 400]
+
+    def test_handle_overload_restore(self):
+        self.set_previous_dispatch()
+        self.power_dispatcher.handle_overload({'name': 'plant3', 'pmin': 600}, 600)
+        assert [plant['p'] for plant in self.power_dispatcher.dispatch_build] == [200, 300, 0]
+
+    def test_handle_overload_float_noise(self):
+        # 0.1 + 0.2 is 0.30000000000000004, the overload must still be fully absorbed by the 0.3MWh plant
+        self.power_dispatcher.dispatch_build = [{'name': 'plant1', 'p': 0.3, 'pmin': 0}]
+        self.power_dispatcher.current_load = 0.3
+        self.power_dispatcher.handle_overload({'name': 'plant2', 'pmin': 1}, 0.1 + 0.2)
+        assert [plant['p'] for plant in self.power_dispatcher.dispatch_build] == [0, 1]
+        assert round(self.power_dispatcher.current_load, 1) == 1
 
     def test_compute_power_reduction_null(self):
         previous_plant = {'name': 'gasfiredbig1', 'p': 100, 'pmin': 0}
@@ -138,10 +259,41 @@ class TestPowerDispatcher(unittest.TestCase):
         assert msg.value
 
     def test_sort_results_default(self):
-        self.power_dispatcher.dispatch_build = pd.DataFrame({'name': ['plant1'], 'p': [1], 'pmin': [0]})
+        self.power_dispatcher.dispatch_build = [{'name': 'plant1', 'p': 1, 'pmin': 0}]
         self.power_dispatcher.current_load = 1
         self.power_dispatcher.required_load = 1
         results = self.power_dispatcher.sort_results()
         assert isinstance(results, list)
         assert len(results) == 1
         assert len(results[0].keys()) == 2
+
+
+class TestApp(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.payload = load_example_payload('payload3.json')
+
+    def test_missing_payload(self):
+        response = self.client.post('/productionplan', data=json.dumps({}))
+        assert response.status_code == 500
+        assert response.get_data(as_text=True) == "KeyError: 'payload not specified', 500\n"
+
+    def test_invalid_payload(self):
+        del self.payload['load']
+        response = self.client.post('/productionplan', data=json.dumps({'payload': self.payload}))
+        assert response.status_code == 500
+        assert response.get_data(as_text=True).startswith('JsonSchemaValueException: ')
+        assert 'load' in response.get_data(as_text=True)
+
+    def test_non_json_body(self):
+        response = self.client.post('/productionplan', data='payload=payload3.json')
+        assert response.status_code == 400
+
+    @pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+    def test_orjson_round_trip(self):
+        assert isinstance(app.json, ORJSONProvider)
+        response = self.client.post('/productionplan', data=json.dumps({'payload': self.payload, 'carbon': '0.3'}))
+        assert response.status_code == 200
+        assert orjson.loads(response.data) == [{'name': 'windpark1', 'p': 90.0}, {'name': 'windpark2', 'p': 21.6},
+                                               {'name': 'gasfiredbig1', 'p': 460}, {'name': 'gasfiredbig2', 'p': 338.4},
+                                               {'name': 'gasfiredsomewhatsmaller', 'p': 0}, {'name': 'tj1', 'p': 0}]
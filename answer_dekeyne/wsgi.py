@@ -0,0 +1,6 @@
+"""
+WSGI entry point for serving the dispatch application with a production server
+"""
+from app_dispatch import app
+
+__all__ = ['app']